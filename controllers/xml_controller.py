@@ -106,14 +106,14 @@ def _process_xml_template(template_path: str, payload: Dict[str, Any],
         }), 500
     
     # Get the updated XML and save to file
-    logger.info("Getting updated XML string")
-    xml_content = editor.get_xml_string()
+    logger.info("Getting updated XML content")
+    xml_content = editor.get_xml_bytes()
     
     # Save to temporary file
     logger.info("Saving to temporary file")
     with tempfile.NamedTemporaryFile(delete=False, suffix='.edm.xml', 
                                      dir=active_config.OUTPUT_DIR) as temp:
-        temp.write(xml_content.encode('utf-8'))
+        temp.write(xml_content)
         temp_path = temp.name
     
     # Get a file name based on the well name if available
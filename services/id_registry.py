@@ -29,14 +29,14 @@ class IDRegistry:
         
         # Create a unique random ID
         chars = string.ascii_letters + string.digits
-        random_part = ''.join(random.choice(chars) for _ in range(length))
+        random_part = ''.join(random.choices(chars, k=length))
         
         # Add prefix if provided
         new_id = f"{prefix}{random_part}" if prefix else random_part
         
         # Ensure uniqueness
         while self._id_exists(new_id):
-            random_part = ''.join(random.choice(chars) for _ in range(length))
+            random_part = ''.join(random.choices(chars, k=length))
             new_id = f"{prefix}{random_part}" if prefix else random_part
         
         # Register the ID
@@ -1,6 +1,8 @@
 # services/xml/binary_data.py
 import os
+import re
 import logging
+from copy import deepcopy
 from typing import Dict, List, Any, Optional
 from lxml import etree as ET
 
@@ -8,6 +10,27 @@ from services.xml.utils import generate_random_id
 
 logger = logging.getLogger(__name__)
 
+# Entity elements referenced by attachment locators: tag -> (ID attribute, entity_ids key)
+_LOCATOR_ENTITIES = {
+    'CD_WELL': ('WELL_ID', 'well_ids'),
+    'CD_WELLBORE': ('WELLBORE_ID', 'wellbore_ids'),
+    'CD_SCENARIO': ('SCENARIO_ID', 'scenario_ids'),
+    'CD_SITE': ('SITE_ID', 'site_ids'),
+}
+
+# One NAME=(value) part of an attachment locator, the parentheses are optional
+_LOCATOR_PART_PATTERN = re.compile(r'([^+=]*)=(?:\(([^+]*)\)|([^+]*))(?=\+|$)')
+
+# Locator ID names replaced with our IDs: locator name -> entity_ids key
+_LOCATOR_ID_MAPPINGS = {
+    'POLICY_ID': 'policy_ids',
+    'PROJECT_ID': 'project_ids',
+    'SITE_ID': 'site_ids',
+    'WELL_ID': 'well_ids',
+    'WELLBORE_ID': 'wellbore_ids',
+    'SCENARIO_ID': 'scenario_ids'
+}
+
 def inject_binary_data(root: ET.Element, template_path: str) -> bool:
     """
     Inject binary data from binary_data_library.xml into the XML.
@@ -32,45 +55,50 @@ def inject_binary_data(root: ET.Element, template_path: str) -> bool:
             logger.warning(f"Binary data library not found at {binary_data_path}")
             return False
         
-        # Load binary data library
-        binary_tree = ET.parse(binary_data_path)
-        binary_root = binary_tree.getroot()
+        # Extract existing IDs from our XML, the BINARY_DATA section holds no entity elements
+        entity_ids = extract_binary_data_entity_ids(root)
         
-        # Find the BINARY_DATA element
-        binary_data_elem = binary_root if binary_root.tag == 'BINARY_DATA' else binary_root.find(".//BINARY_DATA")
+        # Stream the binary data library, only one attachment journal is held in memory at a time;
+        # the attachment payloads can exceed libxml2's default text size limit
+        binary_data_elem = None
+        binary_elem = None
+        for event, elem in ET.iterparse(binary_data_path, events=('start', 'end'),
+                                        tag=('BINARY_DATA', 'CD_ATTACHMENT_JOURNAL'), huge_tree=True):
+            if event == 'start':
+                if binary_data_elem is None and elem.tag == 'BINARY_DATA':
+                    logger.info("Found BINARY_DATA element in binary data library")
+                    binary_data_elem = elem
+                    # Create a new BINARY_DATA element in the export element with the library's attributes
+                    binary_elem = ET.Element("BINARY_DATA", elem.attrib)
+                continue
+            
+            # Process each attachment journal of the first BINARY_DATA element
+            if elem.tag != 'CD_ATTACHMENT_JOURNAL' or elem.getparent() is not binary_data_elem:
+                continue
+            
+            logger.info("Processing CD_ATTACHMENT_JOURNAL element")
+            
+            # Create and add journal element
+            new_journal = create_journal_element(elem, entity_ids)
+            binary_elem.append(new_journal)
+            
+            # Free the processed journal and the ones before it
+            elem.clear()
+            while elem.getprevious() is not None:
+                del binary_data_elem[0]
         
-        if binary_data_elem is None:
+        if binary_elem is None:
             logger.warning("No BINARY_DATA element found in binary data library")
             return False
         
-        logger.info("Found BINARY_DATA element in binary data library")
-        
         # Check if there's already a BINARY_DATA element in our XML
-        existing_binary = root.find(".//BINARY_DATA")
+        existing_binary = next(root.iterdescendants('BINARY_DATA'), None)
         if existing_binary is not None:
             logger.info("Removing existing BINARY_DATA element")
             parent = existing_binary.getparent()
             if parent is not None:
                 parent.remove(existing_binary)
         
-        # Create a new BINARY_DATA element in the export element
-        binary_elem = ET.Element("BINARY_DATA")
-        
-        # Copy attributes
-        for key, value in binary_data_elem.attrib.items():
-            binary_elem.set(key, str(value))
-        
-        # Extract existing IDs from our XML
-        entity_ids = extract_binary_data_entity_ids(root)
-        
-        # Process each attachment journal
-        for journal_elem in binary_data_elem.findall("./CD_ATTACHMENT_JOURNAL"):
-            logger.info("Processing CD_ATTACHMENT_JOURNAL element")
-            
-            # Create and add journal element
-            new_journal = create_journal_element(journal_elem, entity_ids)
-            binary_elem.append(new_journal)
-        
         # Add the binary element to the root
         root.append(binary_elem)
         logger.info("Binary data injected successfully")
@@ -99,23 +127,14 @@ def extract_binary_data_entity_ids(root: ET.Element) -> Dict[str, List[str]]:
         'policy_ids': ['Pzrgw9f4JC']    # Hard-coded from template
     }
     
-    # Extract existing IDs
-    for well_elem in root.xpath(".//CD_WELL"):
-        entity_ids['well_ids'].append(well_elem.get('WELL_ID'))
-    
-    for wellbore_elem in root.xpath(".//CD_WELLBORE"):
-        entity_ids['wellbore_ids'].append(wellbore_elem.get('WELLBORE_ID'))
-    
-    for scenario_elem in root.xpath(".//CD_SCENARIO"):
-        entity_ids['scenario_ids'].append(scenario_elem.get('SCENARIO_ID'))
+    # Extract existing IDs in a single pass over the tree
+    for elem in root.iterdescendants(*_LOCATOR_ENTITIES):
+        id_attr, list_name = _LOCATOR_ENTITIES[elem.tag]
+        entity_ids[list_name].append(elem.get(id_attr))
     
-    for site_elem in root.xpath(".//CD_SITE"):
-        entity_ids['site_ids'].append(site_elem.get('SITE_ID'))
-    
-    logger.debug(f"Found IDs in XML: well_ids={entity_ids['well_ids']}, "
-                f"wellbore_ids={entity_ids['wellbore_ids']}, "
-                f"scenario_ids={entity_ids['scenario_ids']}, "
-                f"site_ids={entity_ids['site_ids']}")
+    logger.debug("Found IDs in XML: well_ids=%s, wellbore_ids=%s, scenario_ids=%s, site_ids=%s",
+                 entity_ids['well_ids'], entity_ids['wellbore_ids'],
+                 entity_ids['scenario_ids'], entity_ids['site_ids'])
     
     return entity_ids
 
@@ -130,25 +149,22 @@ def create_journal_element(journal_elem: ET.Element, entity_ids: Dict[str, List[
     Returns:
         Element: New journal element
     """
-    # Create a new journal element
-    new_journal = ET.Element("CD_ATTACHMENT_JOURNAL")
-    
     # Generate new IDs for the attachments
     attachment_id = generate_random_id(8)
     attachment_journal_id = generate_random_id(8)
     
-    # Copy and update attributes
-    for key, value in journal_elem.attrib.items():
-        if key == "ATTACHMENT_ID":
-            new_journal.set(key, attachment_id)
-        elif key == "ATTACHMENT_JOURNAL_ID":
-            new_journal.set(key, attachment_journal_id)
-        elif key == "ATTACHMENT_LOCATOR":
-            # Create a new locator with our IDs
-            new_locator = update_attachment_locator(value, entity_ids)
-            new_journal.set(key, new_locator)
-        else:
-            new_journal.set(key, value)
+    # Copy the attributes, replacing the IDs in place to keep their order
+    attributes = dict(journal_elem.attrib)
+    if "ATTACHMENT_ID" in attributes:
+        attributes["ATTACHMENT_ID"] = attachment_id
+    if "ATTACHMENT_JOURNAL_ID" in attributes:
+        attributes["ATTACHMENT_JOURNAL_ID"] = attachment_journal_id
+    if "ATTACHMENT_LOCATOR" in attributes:
+        # Create a new locator with our IDs
+        attributes["ATTACHMENT_LOCATOR"] = update_attachment_locator(attributes["ATTACHMENT_LOCATOR"], entity_ids)
+    
+    # Create a new journal element
+    new_journal = ET.Element("CD_ATTACHMENT_JOURNAL", attributes)
     
     # Process the child CD_ATTACHMENT element
     for attachment_elem in journal_elem.findall("./CD_ATTACHMENT"):
@@ -178,27 +194,13 @@ def update_attachment_locator(locator: str, entity_ids: Dict[str, List[str]]) ->
     Returns:
         str: Updated locator string
     """
-    # Parse the locator string
+    # Parse the locator string in one pass, stripping the parentheses
     parts = {}
-    for part in locator.split('+'):
-        if '=' in part:
-            name, id_value = part.split('=', 1)
-            # Strip parentheses
-            if id_value.startswith('(') and id_value.endswith(')'):
-                id_value = id_value[1:-1]
-            parts[name] = id_value
+    for name, bracketed, bare in _LOCATOR_PART_PATTERN.findall(locator):
+        parts[name] = bracketed or bare
     
     # Update with our IDs
-    id_mappings = {
-        'POLICY_ID': 'policy_ids',
-        'PROJECT_ID': 'project_ids',
-        'SITE_ID': 'site_ids',
-        'WELL_ID': 'well_ids',
-        'WELLBORE_ID': 'wellbore_ids',
-        'SCENARIO_ID': 'scenario_ids'
-    }
-    
-    for name, list_name in id_mappings.items():
+    for name, list_name in _LOCATOR_ID_MAPPINGS.items():
         if name in parts and entity_ids.get(list_name):
             parts[name] = entity_ids[list_name][0]
     
@@ -216,22 +218,22 @@ def create_attachment_element(attachment_elem: ET.Element, attachment_id: str) -
     Returns:
         Element: New attachment element
     """
-    new_attachment = ET.Element("CD_ATTACHMENT")
+    # Copy the attributes, replacing the attachment ID in place to keep their order
+    attributes = dict(attachment_elem.attrib)
+    if "ATTACHMENT_ID" in attributes:
+        attributes["ATTACHMENT_ID"] = attachment_id
     
-    # Copy and update attributes
-    for key, value in attachment_elem.attrib.items():
-        if key == "ATTACHMENT_ID":
-            new_attachment.set(key, attachment_id)
-        else:
-            new_attachment.set(key, value)
+    new_attachment = ET.Element("CD_ATTACHMENT", attributes)
     
     # Copy the binary data content
     if attachment_elem.text:
         new_attachment.text = attachment_elem.text
     
-    # Copy any children of the attachment (if any)
+    # Copy any children of the attachment (if any), dropping only whitespace tails
     for child in attachment_elem:
-        new_child = ET.fromstring(ET.tostring(child))
+        new_child = deepcopy(child)
+        if new_child.tail and not new_child.tail.strip():
+            new_child.tail = None
         new_attachment.append(new_child)
     
     return new_attachment
\ No newline at end of file
@@ -1,16 +1,18 @@
 # services/xml/casing_handlers.py
 import logging
-from datetime import datetime
 from typing import Dict, List, Any, Optional
 from lxml import etree as ET
 
 from services.xml.utils import generate_random_id
-from services.xml.element_operations import create_element, remove_existing_elements
+from services.xml.element_operations import (
+    create_element, remove_elements, find_elements_by_attribute, creation_info_attributes
+)
 
 logger = logging.getLogger(__name__)
 
 def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
-                           assemblies: List[Dict[str, Any]]) -> bool:
+                           assemblies: List[Dict[str, Any]],
+                           creation_info: Optional[Dict[str, str]] = None) -> bool:
     """
     Update casing assemblies and their components in the XML.
     
@@ -19,6 +21,7 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
         well_id: Well ID
         wellbore_id: Wellbore ID
         assemblies: List of assembly data
+        creation_info: Audit attributes to stamp on new elements (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -26,9 +29,12 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
     try:
         logger.info(f"Updating {len(assemblies)} casing assemblies")
         
+        # Stamp every element created in this run with the same audit info
+        if creation_info is None:
+            creation_info = creation_info_attributes()
+        
         # Get existing assembly IDs to reuse
-        existing_assemblies = root.xpath(".//CD_ASSEMBLY")
-        existing_ids = [elem.get('ASSEMBLY_ID') for elem in existing_assemblies]
+        existing_ids = [elem.get('ASSEMBLY_ID') for elem in root.iterdescendants('CD_ASSEMBLY')]
         
         # Keep track of created assemblies for updating CASE elements later
         created_assemblies = []
@@ -44,7 +50,7 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
                     assembly_id = generate_random_id()
             
             # Remove existing assembly with this ID if it exists
-            remove_existing_elements(root, f".//CD_ASSEMBLY[@ASSEMBLY_ID='{assembly_id}']")
+            remove_elements(find_elements_by_attribute(root, 'CD_ASSEMBLY', 'ASSEMBLY_ID', assembly_id))
             
             # Create new assembly
             assembly_attrs = {
@@ -60,18 +66,11 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
                 'MD_ASSEMBLY_TOP': str(assembly.get('topDepth')),
                 'MD_TOC': str(assembly.get('tocDepth', assembly.get('topDepth'))),
                 'MUD_DENSITY_SHOE': str(assembly.get('mudDensityShoe', 0)),
-                'IS_TOP_DOWN': assembly.get('isTopDown', 'Y'),
-                'CREATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'CREATE_USER_ID': 'API_USER',
-                'CREATE_APP_ID': 'XML_API',
-                'UPDATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'UPDATE_USER_ID': 'API_USER',
-                'UPDATE_APP_ID': 'XML_API'
+                'IS_TOP_DOWN': assembly.get('isTopDown', 'Y')
             }
             
             # Create and add the element to the root
-            assembly_elem = create_element('CD_ASSEMBLY', assembly_attrs)
-            root.append(assembly_elem)
+            create_element('CD_ASSEMBLY', assembly_attrs, creation_info, parent=root)
             
             logger.info(f"Added assembly: {assembly.get('assemblyName')}, ID: {assembly_id}")
             created_assemblies.append({
@@ -81,10 +80,11 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
             
             # Process components for this assembly
             if 'components' in assembly and assembly['components']:
-                update_assembly_components(root, well_id, wellbore_id, assembly_id, assembly['components'])
+                update_assembly_components(root, well_id, wellbore_id, assembly_id,
+                                           assembly['components'], creation_info)
             
         # Update CASE elements to reflect the assemblies
-        update_case_elements(root, well_id, wellbore_id, created_assemblies)
+        update_case_elements(root, well_id, wellbore_id, created_assemblies, creation_info)
             
         return True
     except Exception as e:
@@ -92,7 +92,8 @@ def update_casing_assemblies(root: ET.Element, well_id: str, wellbore_id: str,
         return False
 
 def update_assembly_components(root: ET.Element, well_id: str, wellbore_id: str, 
-                             assembly_id: str, components: List[Dict[str, Any]]) -> bool:
+                             assembly_id: str, components: List[Dict[str, Any]],
+                             creation_info: Optional[Dict[str, str]] = None) -> bool:
     """
     Update assembly components in the XML.
     
@@ -102,6 +103,7 @@ def update_assembly_components(root: ET.Element, well_id: str, wellbore_id: str,
         wellbore_id: Wellbore ID
         assembly_id: Assembly ID
         components: List of component data
+        creation_info: Audit attributes to stamp on new elements (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -109,9 +111,12 @@ def update_assembly_components(root: ET.Element, well_id: str, wellbore_id: str,
     try:
         logger.info(f"Updating {len(components)} components for assembly {assembly_id}")
         
+        if creation_info is None:
+            creation_info = creation_info_attributes()
+        
         # Remove existing components for this assembly
-        remove_existing_elements(root, f".//CD_ASSEMBLY_COMP[@ASSEMBLY_ID='{assembly_id}']")
-        remove_existing_elements(root, f".//CD_WEQP_PACKER[@ASSEMBLY_ID='{assembly_id}']")
+        remove_elements(find_elements_by_attribute(root, 'CD_ASSEMBLY_COMP', 'ASSEMBLY_ID', assembly_id))
+        remove_elements(find_elements_by_attribute(root, 'CD_WEQP_PACKER', 'ASSEMBLY_ID', assembly_id))
         
         # Process each component
         for i, component in enumerate(components):
@@ -126,13 +131,7 @@ def update_assembly_components(root: ET.Element, well_id: str, wellbore_id: str,
                 'ASSEMBLY_COMP_ID': component_id,
                 'COMP_TYPE_CODE': component.get('componentType'),
                 'SECT_TYPE_CODE': component.get('componentType'),
-                'SEQUENCE_NO': str(float(i)),
-                'CREATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'CREATE_USER_ID': 'API_USER',
-                'CREATE_APP_ID': 'XML_API',
-                'UPDATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'UPDATE_USER_ID': 'API_USER',
-                'UPDATE_APP_ID': 'XML_API'
+                'SEQUENCE_NO': str(float(i))
             }
             
             # Add physical properties for non-PKR types
@@ -179,11 +178,8 @@ def update_assembly_components(root: ET.Element, well_id: str, wellbore_id: str,
                 if 'materialId' in component and component['materialId']:
                     component_attrs['MATERIAL_ID'] = component['materialId']
             
-            # Create the element
-            component_elem = create_element('CD_ASSEMBLY_COMP', component_attrs)
-            
-            # Add to the root
-            root.append(component_elem)
+            # Create the element and add it to the root
+            create_element('CD_ASSEMBLY_COMP', component_attrs, creation_info, parent=root)
             
             logger.info(f"Added component: {component.get('componentType')}, ID: {component_id}")
             
@@ -246,18 +242,16 @@ def add_packer_details(root: ET.Element, well_id: str, wellbore_id: str,
             'IS_EXP_JOINT_NOGO_PRESENT': 'N'
         }
         
-        # Create the element
-        packer_elem = create_element('CD_WEQP_PACKER', packer_attrs)
-        
-        # Add to the root
-        root.append(packer_elem)
+        # Create the element and add it to the root
+        create_element('CD_WEQP_PACKER', packer_attrs, parent=root)
         
         logger.info(f"Added packer details for component ID: {component_id}")
     except Exception as e:
         logger.error(f"Error adding packer details: {str(e)}", exc_info=True)
 
 def update_case_elements(root: ET.Element, well_id: str, wellbore_id: str, 
-                       assemblies: List[Dict[str, Any]]) -> bool:
+                       assemblies: List[Dict[str, Any]],
+                       creation_info: Optional[Dict[str, str]] = None) -> bool:
     """
     Update CASE elements to reflect the assemblies.
     
@@ -266,6 +260,7 @@ def update_case_elements(root: ET.Element, well_id: str, wellbore_id: str,
         well_id: Well ID
         wellbore_id: Wellbore ID
         assemblies: List of created assembly info
+        creation_info: Audit attributes to stamp on new elements (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -273,17 +268,20 @@ def update_case_elements(root: ET.Element, well_id: str, wellbore_id: str,
     try:
         logger.info("Updating CASE elements for assemblies")
         
+        if creation_info is None:
+            creation_info = creation_info_attributes()
+        
         # Find scenario ID
-        scenario_elements = root.xpath(".//CD_SCENARIO")
-        if not scenario_elements:
+        scenario_elem = next(root.iter('CD_SCENARIO'), None)
+        if scenario_elem is None:
             logger.warning("No CD_SCENARIO element found")
             return False
         
-        scenario_id = scenario_elements[0].get('SCENARIO_ID')
+        scenario_id = scenario_elem.get('SCENARIO_ID')
         
         # Remove existing CASE elements
         for assembly in assemblies:
-            remove_existing_elements(root, f".//CD_CASE[@ASSEMBLY_ID='{assembly['id']}']")
+            remove_elements(find_elements_by_attribute(root, 'CD_CASE', 'ASSEMBLY_ID', assembly['id']))
         
         # Create a CASE element for each assembly
         for i, assembly in enumerate(assemblies):
@@ -297,18 +295,11 @@ def update_case_elements(root: ET.Element, well_id: str, wellbore_id: str,
                 'CASE_NAME': assembly['name'],
                 'ASSEMBLY_ID': assembly['id'],
                 'IS_LINKED': 'Y',
-                'SEQUENCE_NO': str(float(i)),
-                'CREATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'CREATE_USER_ID': 'API_USER',
-                'CREATE_APP_ID': 'XML_API',
-                'UPDATE_DATE': f"{{ts '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'}}",
-                'UPDATE_USER_ID': 'API_USER',
-                'UPDATE_APP_ID': 'XML_API'
+                'SEQUENCE_NO': str(float(i))
             }
             
             # Create and add the element
-            case_elem = create_element('CD_CASE', case_attrs)
-            root.append(case_elem)
+            create_element('CD_CASE', case_attrs, creation_info, parent=root)
             
             logger.info(f"Added CASE element for assembly: {assembly['name']}, ID: {assembly['id']}")
         
@@ -1,16 +1,25 @@
 # services/xml/dls_handlers.py
 import logging
-from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from lxml import etree as ET
 
-from services.xml.utils import generate_random_id
-from services.xml.element_operations import create_element, remove_existing_elements, find_group_element
+from services.xml.element_operations import (
+    remove_elements, replace_group_rows, find_group_element, find_elements_by_attribute,
+    find_sibling_elements_by_attribute, creation_info_attributes, ElementIndex
+)
 
 logger = logging.getLogger(__name__)
 
+# Compiled XPath for the group lookup without an element index, the group ID is bound through $group_id
+_DLS_OVERRIDE_GROUP_XPATH = ET.XPath(".//TU_DLS_OVERRIDE_GROUP[@DLS_OVERRIDE_GROUP_ID=$group_id]")
+
+# (tag_name, id_attr) of the group element in an element index
+_DLS_OVERRIDE_GROUP_KEY = ('TU_DLS_OVERRIDE_GROUP', 'DLS_OVERRIDE_GROUP_ID')
+
 def update_dls_overrides(root: ET.Element, well_id: str, wellbore_id: str, scenario_id: str, 
-                        dls_group_id: str, dls_overrides: List[Dict[str, Any]]) -> bool:
+                        dls_group_id: str, dls_overrides: List[Dict[str, Any]],
+                        creation_info: Optional[Dict[str, str]] = None,
+                        element_index: Optional[ElementIndex] = None) -> bool:
     """
     Update dogleg severity overrides in the XML.
     
@@ -21,6 +30,8 @@ def update_dls_overrides(root: ET.Element, well_id: str, wellbore_id: str, scena
         scenario_id: Scenario ID
         dls_group_id: DLS override group ID
         dls_overrides: List of DLS override data
+        creation_info: Audit attributes to stamp on the overrides (optional)
+        element_index: Index from build_element_index() to find the group in (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -28,56 +39,49 @@ def update_dls_overrides(root: ET.Element, well_id: str, wellbore_id: str, scena
     try:
         logger.info(f"Updating DLS overrides for group {dls_group_id}")
         
-        # Remove existing DLS override entries
-        remove_existing_elements(root, f".//TU_DLS_OVERRIDE[@DLS_OVERRIDE_GROUP_ID='{dls_group_id}']")
-        
         # Find the DLS override group element
-        group_result = find_group_element(
-            root,
-            f".//TU_DLS_OVERRIDE_GROUP[@DLS_OVERRIDE_GROUP_ID='{dls_group_id}']",
-            dls_group_id
-        )
+        group_elem = find_group_element(root, _DLS_OVERRIDE_GROUP_XPATH, dls_group_id,
+                                        element_index, _DLS_OVERRIDE_GROUP_KEY)
         
-        if not group_result:
+        if group_elem is None:
+            remove_elements(find_elements_by_attribute(root, 'TU_DLS_OVERRIDE', 'DLS_OVERRIDE_GROUP_ID',
+                                                       dls_group_id))
             return False
         
-        _, parent_elem, group_index = group_result
+        # Existing DLS override entries next to the group, replaced below
+        existing = find_sibling_elements_by_attribute(group_elem, 'TU_DLS_OVERRIDE', 'DLS_OVERRIDE_GROUP_ID',
+                                                      dls_group_id)
         
         # Sort DLS overrides by top depth in descending order (deepest first)
         sorted_overrides = sorted(dls_overrides, key=lambda x: float(x.get('topDepth', 0)), reverse=True)
         
-        # Add new DLS override elements
-        for i, override in enumerate(sorted_overrides):
-            # Generate a new ID for each override
-            override_id = generate_random_id()
+        # Stamp all overrides with the same audit info
+        if creation_info is None:
+            creation_info = creation_info_attributes()
+        
+        # Build the DLS override rows, the ID is assigned by replace_group_rows
+        rows = []
+        for override in sorted_overrides:
+            md_top = str(override.get('topDepth'))
+            md_base = str(override.get('baseDepth'))
+            dogleg_severity = str(override.get('doglegSeverity'))
 
-            # Create element attributes
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            element_attrs = {
+            rows.append({
                 'WELL_ID': well_id,
                 'WELLBORE_ID': wellbore_id,
                 'SCENARIO_ID': scenario_id,
                 'DLS_OVERRIDE_GROUP_ID': dls_group_id,
-                'DLS_OVERRIDE_ID': override_id,
-                'MD_TOP': str(override.get('topDepth')),
-                'MD_BASE': str(override.get('baseDepth')),
-                'DOGLEG_SEVERITY': str(override.get('doglegSeverity')),
-                'CREATE_DATE': f"{{ts '{now}'}}",
-                'CREATE_USER_ID': 'API_USER',
-                'CREATE_APP_ID': 'XML_API',
-                'UPDATE_DATE': f"{{ts '{now}'}}",
-                'UPDATE_USER_ID': 'API_USER',
-                'UPDATE_APP_ID': 'XML_API'
-            }
+                'DLS_OVERRIDE_ID': None,
+                'MD_TOP': md_top,
+                'MD_BASE': md_base,
+                'DOGLEG_SEVERITY': dogleg_severity
+            })
             
-            # Create the element
-            element = create_element('TU_DLS_OVERRIDE', element_attrs)
-            
-            # Insert the element
-            parent_elem.insert(group_index + 1 + i, element)
-            
-            logger.info(f"Added DLS override: {override.get('topDepth')}-{override.get('baseDepth')}, "
-                       f"DLS={override.get('doglegSeverity')}")
+            logger.debug("Added DLS override: %s-%s, DLS=%s", md_top, md_base, dogleg_severity)
+        
+        # Write the rows directly after the group element
+        replace_group_rows(group_elem, existing, 'TU_DLS_OVERRIDE', rows, 'DLS_OVERRIDE_ID', creation_info)
+        logger.info(f"Added {len(rows)} DLS overrides")
         
         return True
     except Exception as e:
@@ -4,48 +4,160 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from lxml import etree as ET
 
-from services.xml.utils import format_xpath
+from services.xml.utils import compile_id_xpath, generate_random_id
 
 logger = logging.getLogger(__name__)
 
-def update_element_attribute(root: ET.Element, tag_name: str, id_attr: str, 
-                            id_value: str, attr_name: str, attr_value: Any) -> bool:
+# Name attribute of each element type, elements not listed use NAME
+_NAME_ATTR_BY_TAG = {
+    'CD_SITE': 'SITE_NAME',
+    'CD_WELL': 'WELL_COMMON_NAME',
+    'CD_WELLBORE': 'WELLBORE_NAME',
+    'CD_DATUM': 'DATUM_NAME',
+    'CD_ASSEMBLY': 'ASSEMBLY_NAME',
+    'CD_CASE': 'CASE_NAME',
+}
+
+# ID attribute of the entity and group elements kept in an element index;
+# the payload updaters never add or remove these elements
+_ID_ATTR_BY_TAG = {
+    'CD_SITE': 'SITE_ID',
+    'CD_WELL': 'WELL_ID',
+    'CD_WELLBORE': 'WELLBORE_ID',
+    'CD_SCENARIO': 'SCENARIO_ID',
+    'CD_DATUM': 'DATUM_ID',
+    'CD_TEMP_GRADIENT_GROUP': 'TEMP_GRADIENT_GROUP_ID',
+    'CD_PORE_PRESSURE_GROUP': 'PORE_PRESSURE_GROUP_ID',
+    'CD_FRAC_GRADIENT_GROUP': 'FRAC_GRADIENT_GROUP_ID',
+    'TU_DLS_OVERRIDE_GROUP': 'DLS_OVERRIDE_GROUP_ID',
+    'CD_DEFINITIVE_SURVEY_HEADER': 'DEF_SURVEY_HEADER_ID',
+}
+
+ElementIndex = Dict[Tuple[str, str, str], List[ET.Element]]
+
+# Elements whose first occurrence seeds extract_entity_ids()
+_ENTITY_SEED_TAGS = ('CD_SITE', 'CD_WELL', 'CD_WELLBORE', 'CD_SCENARIO', 'TU_DLS_OVERRIDE_GROUP')
+
+# Audit attributes kept when an existing element is rewritten
+_CREATE_INFO_ATTRS = ('CREATE_DATE', 'CREATE_USER_ID', 'CREATE_APP_ID')
+
+# Audit attributes refreshed when an existing element is modified
+_UPDATE_INFO_ATTRS = ('UPDATE_DATE', 'UPDATE_USER_ID', 'UPDATE_APP_ID')
+
+# Audit attributes, setting one of these directly does not stamp the element
+_AUDIT_ATTRS = frozenset(_CREATE_INFO_ATTRS + _UPDATE_INFO_ATTRS)
+
+# Project info names: (payload section, payload field, ((tag, ID attribute, entity_ids key), ...));
+# the scenario is named after the well
+_PROJECT_NAME_FIELDS = (
+    ('site', 'siteName', (('CD_SITE', 'SITE_ID', 'site_id'),)),
+    ('well', 'wellCommonName', (('CD_WELL', 'WELL_ID', 'well_id'),
+                                ('CD_SCENARIO', 'SCENARIO_ID', 'scenario_id'))),
+    ('wellbore', 'wellboreName', (('CD_WELLBORE', 'WELLBORE_ID', 'wellbore_id'),)),
+)
+
+def _evaluate_xpath(root: ET.Element, xpath: ET.XPath, **variables: Any) -> List[ET.Element]:
+    """Evaluate a compiled XPath against root with the given variables."""
+    return xpath(root, **variables)
+
+def build_element_index(root: ET.Element) -> ElementIndex:
     """
-    Update a specific attribute in an element identified by its tag and ID.
+    Index the entity, profile group and survey header elements by their ID.
     
     Args:
         root: Root XML element
-        tag_name: Element tag name (e.g., 'CD_SITE')
-        id_attr: ID attribute name (e.g., 'SITE_ID')
+        
+    Returns:
+        Dictionary mapping (tag_name, id_attr, id_value) to the matching elements
+    """
+    index = {}
+    for element in root.iter(*_ID_ATTR_BY_TAG):
+        id_attr = _ID_ATTR_BY_TAG[element.tag]
+        id_value = element.get(id_attr)
+        if id_value is not None:
+            index.setdefault((element.tag, id_attr, id_value), []).append(element)
+    return index
+
+def update_element_attributes(root: ET.Element, tag_name: str, id_attr: str, id_value: str,
+                              attributes: Dict[str, Any],
+                              element_index: Optional[ElementIndex] = None,
+                              creation_info: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Update several attributes of an element identified by its tag and ID.
+    
+    The element is looked up once for all attributes.
+    
+    Args:
+        root: Root XML element
+        tag_name: Element tag name (e.g., 'CD_DATUM')
+        id_attr: ID attribute name (e.g., 'DATUM_ID')
         id_value: ID attribute value to match
-        attr_name: Attribute name to update
-        attr_value: New attribute value
+        attributes: Attribute names and new values
+        element_index: Index from build_element_index() to look the element
+            up in instead of searching the tree (optional)
+        creation_info: Audit attributes from creation_info_attributes() whose
+            UPDATE_* values are stamped on the element (optional)
         
     Returns:
         bool: True if element was found and updated, False otherwise
     """
-    xpath = format_xpath(tag_name, id_attr, id_value)
-    elements = root.xpath(xpath)
+    if element_index is not None and _ID_ATTR_BY_TAG.get(tag_name) == id_attr:
+        elements = element_index.get((tag_name, id_attr, id_value), [])
+    else:
+        elements = compile_id_xpath(tag_name, id_attr)(root, value=id_value)
     
     if not elements:
-        logger.warning(f"No elements found for xpath: {xpath}")
+        logger.warning(f"No {tag_name} elements found with {id_attr}={id_value}")
         return False
     
+    values = {attr_name: str(attr_value) for attr_name, attr_value in attributes.items()}
+    
+    # Update the timestamp unless only audit attributes are set, using one timestamp for all matches;
+    # audit attributes set explicitly are kept
+    update_info = None
+    if not _AUDIT_ATTRS.issuperset(values):
+        if creation_info is None:
+            creation_info = creation_info_attributes()
+        update_info = {attr: creation_info[attr] for attr in _UPDATE_INFO_ATTRS if attr not in values}
+    
     for element in elements:
-        element.set(attr_name, str(attr_value))
-        logger.debug(f"Updated attribute {attr_name}={attr_value} for element {tag_name}")
+        element.attrib.update(values)
+        logger.debug("Updated attributes %s for element %s", values, tag_name)
         
-        # Update the timestamp if it's not an update date
-        if attr_name not in ['CREATE_DATE', 'UPDATE_DATE']:
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            element.set('UPDATE_DATE', f"{{ts '{now}'}}")
-            element.set('UPDATE_USER_ID', 'API_USER')
-            element.set('UPDATE_APP_ID', 'XML_API')
+        if update_info:
+            element.attrib.update(update_info)
     
     return True
 
+def update_element_attribute(root: ET.Element, tag_name: str, id_attr: str, 
+                            id_value: str, attr_name: str, attr_value: Any,
+                            element_index: Optional[ElementIndex] = None,
+                            creation_info: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Update a specific attribute in an element identified by its tag and ID.
+    
+    Args:
+        root: Root XML element
+        tag_name: Element tag name (e.g., 'CD_SITE')
+        id_attr: ID attribute name (e.g., 'SITE_ID')
+        id_value: ID attribute value to match
+        attr_name: Attribute name to update
+        attr_value: New attribute value
+        element_index: Index from build_element_index() to look the element
+            up in instead of searching the tree (optional)
+        creation_info: Audit attributes from creation_info_attributes() whose
+            UPDATE_* values are stamped on the element (optional)
+        
+    Returns:
+        bool: True if element was found and updated, False otherwise
+    """
+    return update_element_attributes(root, tag_name, id_attr, id_value, {attr_name: attr_value},
+                                     element_index, creation_info)
+
 def update_element_name(root: ET.Element, tag_name: str, id_attr: str, 
-                       id_value: str, name_value: str) -> bool:
+                       id_value: str, name_value: str,
+                       element_index: Optional[ElementIndex] = None,
+                       creation_info: Optional[Dict[str, str]] = None) -> bool:
     """
     Update the name attribute of an element identified by its tag and ID.
     
@@ -55,83 +167,262 @@ def update_element_name(root: ET.Element, tag_name: str, id_attr: str,
         id_attr: ID attribute name (e.g., 'SITE_ID')
         id_value: ID attribute value to match
         name_value: New name value
+        element_index: Index from build_element_index() (optional)
+        creation_info: Audit attributes from creation_info_attributes() (optional)
         
     Returns:
         bool: True if element was found and updated, False otherwise
     """
     # Determine the name attribute based on the tag
-    name_attr_map = {
-        'CD_SITE': 'SITE_NAME',
-        'CD_WELL': 'WELL_COMMON_NAME',
-        'CD_WELLBORE': 'WELLBORE_NAME',
-        'CD_DATUM': 'DATUM_NAME',
-        'CD_ASSEMBLY': 'ASSEMBLY_NAME',
-        'CD_CASE': 'CASE_NAME',
-    }
+    name_attr = _NAME_ATTR_BY_TAG.get(tag_name, 'NAME')
     
-    name_attr = name_attr_map.get(tag_name, 'NAME')
-    
-    result = update_element_attribute(root, tag_name, id_attr, id_value, name_attr, name_value)
+    result = update_element_attribute(root, tag_name, id_attr, id_value, name_attr, name_value,
+                                      element_index, creation_info)
     if result:
         logger.info(f"Updated {name_attr} to '{name_value}' for {tag_name} with {id_attr}={id_value}")
     return result
 
-def create_element(tag_name: str, attributes: Dict[str, Any]) -> ET.Element:
+def create_element(tag_name: str, attributes: Dict[str, Any],
+                  creation_info: Optional[Dict[str, str]] = None,
+                  parent: Optional[ET.Element] = None,
+                  stringify: bool = True) -> ET.Element:
     """
     Create a new XML element with the specified attributes.
     
     Args:
         tag_name: Element tag name
         attributes: Dictionary of attribute name-value pairs
+        creation_info: Audit attributes from creation_info_attributes() to
+            append after the regular attributes (optional)
+        parent: Element to append the new element to (optional)
+        stringify: Convert non-string values with str(); pass False when all
+            values are already strings
         
     Returns:
         Element: The created element
     """
-    element = ET.Element(tag_name)
-    for attr, value in attributes.items():
-        element.set(attr, str(value))
-    logger.debug(f"Created new element {tag_name} with attributes: {attributes}")
+    # Stringify values up front and set all attributes in a single call
+    if stringify:
+        attrs = {attr: value if isinstance(value, str) else str(value)
+                 for attr, value in attributes.items()}
+        if creation_info:
+            attrs.update(creation_info)
+    elif creation_info:
+        attrs = {**attributes, **creation_info}
+    else:
+        attrs = attributes
+    
+    if parent is not None:
+        element = ET.SubElement(parent, tag_name, attrs)
+    else:
+        element = ET.Element(tag_name, attrs)
+    logger.debug("Created new element %s with attributes: %s", tag_name, attributes)
     return element
 
-def remove_existing_elements(root: ET.Element, xpath: str) -> None:
+def creation_info_attributes() -> Dict[str, str]:
+    """
+    Build the CREATE_*/UPDATE_* audit attributes for newly created elements.
+    
+    The timestamp is taken once, so every element stamped with the returned
+    attributes shares the same creation and update date.
+    
+    Returns:
+        Dictionary of audit attribute name-value pairs
+    """
+    # isoformat() yields 'YYYY-MM-DD HH:MM:SS' without parsing a strftime format
+    timestamp = f"{{ts '{datetime.now().isoformat(sep=' ', timespec='seconds')}'}}"
+    return {
+        'CREATE_DATE': timestamp,
+        'CREATE_USER_ID': 'API_USER',
+        'CREATE_APP_ID': 'XML_API',
+        'UPDATE_DATE': timestamp,
+        'UPDATE_USER_ID': 'API_USER',
+        'UPDATE_APP_ID': 'XML_API'
+    }
+
+def find_elements_by_attribute(root: ET.Element, tag_name: str, attr_name: str,
+                               attr_value: Optional[str]) -> List[ET.Element]:
     """
-    Remove existing elements matching the given XPath.
+    Find the descendant elements with a tag whose attribute has a given value.
+    
+    Iterating the tag in C and comparing the attribute is cheaper than
+    evaluating an equivalent XPath with an attribute predicate.
     
     Args:
         root: Root XML element
-        xpath: XPath to find elements to remove
+        tag_name: Element tag name
+        attr_name: Attribute name to filter on
+        attr_value: Attribute value to match, None matches nothing
+        
+    Returns:
+        List of matching elements in document order
+    """
+    if attr_value is None:
+        return []
+    return [element for element in root.iterdescendants(tag_name) if element.get(attr_name) == attr_value]
+
+def find_sibling_elements_by_attribute(element: ET.Element, tag_name: str, attr_name: str,
+                                       attr_value: Optional[str]) -> List[ET.Element]:
+    """
+    Find the siblings of an element with a tag whose attribute has a given value.
+    
+    Used for the row elements of a group, which sit next to the group element;
+    only the group's parent is scanned instead of the whole tree.
+    
+    Args:
+        element: Element whose siblings are searched, e.g. a group element
+        tag_name: Element tag name
+        attr_name: Attribute name to filter on
+        attr_value: Attribute value to match, None matches nothing
+        
+    Returns:
+        List of matching elements in document order
     """
-    elements = root.xpath(xpath)
-    logger.debug(f"Removing {len(elements)} elements matching: {xpath}")
+    parent = element.getparent()
+    if parent is None or attr_value is None:
+        return []
+    return [child for child in parent.iterchildren(tag_name) if child.get(attr_name) == attr_value]
+
+def remove_elements(elements: List[ET.Element]) -> None:
+    """
+    Detach the given elements from their parents.
+    
+    Elements are grouped by parent so that each parent's child list is
+    changed once, instead of one linear remove() scan per element. A
+    contiguous run of siblings, the common case for rows written together,
+    is cut out with a single slice deletion.
+    
+    Args:
+        elements: Elements to remove
+    """
+    removals_by_parent = {}
     for element in elements:
         parent = element.getparent()
         if parent is not None:
-            parent.remove(element)
+            removals_by_parent.setdefault(parent, (parent, set()))[1].add(element)
+    
+    for parent, removals in removals_by_parent.values():
+        if len(removals) == 1:
+            parent.remove(next(iter(removals)))
+            continue
+        
+        positions = [i for i, child in enumerate(parent) if child in removals]
+        first, last = positions[0], positions[-1]
+        if last - first + 1 == len(positions):
+            del parent[first:last + 1]
+        else:
+            parent[:] = [child for child in parent if child not in removals]
 
-def find_group_element(root: ET.Element, xpath: str, 
-                     group_id: str) -> Optional[Tuple[ET.Element, ET.Element, int]]:
+def replace_group_rows(group_elem: ET.Element, existing: List[ET.Element], tag_name: str,
+                       rows: List[Dict[str, Any]], id_attr: str,
+                       creation_info: Optional[Dict[str, str]] = None) -> None:
     """
-    Find a group element and its parent by XPath.
+    Replace the row elements of a group with new attribute rows.
+    
+    When the number of rows is unchanged and every existing element has an
+    ID, the existing elements are rewritten in place: they keep their IDs,
+    their CREATE_* audit attributes and their position in the document, and
+    an element that keeps CREATE_* attributes gets fresh UPDATE_* ones.
+    Otherwise they are removed and new elements with fresh IDs are inserted
+    directly after the group element.
+    
+    Args:
+        group_elem: Group element the rows belong to
+        existing: Current row elements of the group
+        tag_name: Tag name of the row elements
+        rows: Attribute dictionaries with string values, in document order;
+            the id_attr entry is filled in here
+        id_attr: ID attribute name of the row elements
+        creation_info: Audit attributes to stamp on the rows (optional)
+    """
+    # Check every existing ID before changing anything, so the tree is never left half rewritten
+    existing_ids = [element.get(id_attr) for element in existing]
+    if existing and len(existing) == len(rows) and None not in existing_ids:
+        update_info = {attr: creation_info[attr] for attr in _UPDATE_INFO_ATTRS} if creation_info else None
+        for element, element_id, attrs in zip(existing, existing_ids, rows):
+            attrs[id_attr] = element_id
+            # The row keeps its ID, so it keeps its creation audit attributes too
+            kept_create_info = False
+            for attr in _CREATE_INFO_ATTRS:
+                value = element.get(attr)
+                if value is not None:
+                    attrs[attr] = value
+                    kept_create_info = True
+            if update_info:
+                attrs.update(update_info)
+            elif kept_create_info:
+                # Stamp rows with creation audit attributes as updated, using one timestamp for all rows
+                if creation_info is None:
+                    creation_info = creation_info_attributes()
+                attrs.update({attr: creation_info[attr] for attr in _UPDATE_INFO_ATTRS})
+            element.attrib.clear()
+            element.attrib.update(attrs)
+        logger.debug("Rewrote %d %s elements in place", len(rows), tag_name)
+        return
+    
+    remove_elements(existing)
+    
+    new_elements = []
+    for attrs in rows:
+        attrs[id_attr] = generate_random_id()
+        new_elements.append(create_element(tag_name, attrs, creation_info, stringify=False))
+    
+    # Splice the new elements in right after the group element in one go
+    parent_elem = group_elem.getparent()
+    group_index = parent_elem.index(group_elem)
+    parent_elem[group_index + 1:group_index + 1] = new_elements
+
+def find_indexed_elements(root: ET.Element, xpath: ET.XPath, tag_name: str, id_attr: str,
+                          id_value: str, element_index: Optional[ElementIndex] = None,
+                          **variables) -> List[ET.Element]:
+    """
+    Find elements by ID in an element index, or by XPath without one.
     
     Args:
         root: Root XML element
-        xpath: XPath to find the group element
+        xpath: Compiled XPath to fall back to
+        tag_name: Element tag name
+        id_attr: ID attribute name
+        id_value: ID attribute value to match
+        element_index: Index from build_element_index() (optional)
+        **variables: XPath variables bound when falling back to the XPath
+        
+    Returns:
+        List of matching elements
+    """
+    if element_index is not None and _ID_ATTR_BY_TAG.get(tag_name) == id_attr:
+        return element_index.get((tag_name, id_attr, id_value), [])
+    return _evaluate_xpath(root, xpath, **variables)
+
+def find_group_element(root: ET.Element, xpath: ET.XPath, 
+                     group_id: str, element_index: Optional[ElementIndex] = None,
+                     index_key: Optional[Tuple[str, str]] = None) -> Optional[ET.Element]:
+    """
+    Find a group element by ID in an element index, or by XPath without one.
+    
+    Args:
+        root: Root XML element
+        xpath: Compiled XPath to find the group element;
+            group_id is bound to the $group_id variable
         group_id: ID of the group to find
+        element_index: Index from build_element_index() to look the group
+            up in instead of evaluating the XPath (optional)
+        index_key: (tag_name, id_attr) of the group in the element index
         
     Returns:
-        Tuple of (group_element, parent_element, index) or None if not found
+        The group element, or None if not found
     """
-    group_elements = root.xpath(xpath)
+    if index_key is not None:
+        group_elements = find_indexed_elements(root, xpath, *index_key, group_id, element_index,
+                                               group_id=group_id)
+    else:
+        group_elements = _evaluate_xpath(root, xpath, group_id=group_id)
     
     if not group_elements:
-        logger.warning(f"Group element not found with XPath: {xpath}")
+        logger.warning(f"Group element not found with XPath: {xpath.path} ({group_id})")
         return None
     
-    group_elem = group_elements[0]
-    parent_elem = group_elem.getparent()
-    group_index = parent_elem.index(group_elem)
-    
-    return group_elem, parent_elem, group_index
+    return group_elements[0]
 
 def extract_entity_ids(root: ET.Element) -> Dict[str, str]:
     """
@@ -156,45 +447,55 @@ def extract_entity_ids(root: ET.Element) -> Dict[str, str]:
         'datum_id': None
     }
     
-    # Find site element and extract ID
-    site_elements = root.xpath(".//CD_SITE")
-    if site_elements:
-        entity_ids['site_id'] = site_elements[0].get('SITE_ID')
+    # Find the first element of each entity type in a single pass over the tree
+    first_elems = {}
+    for element in root.iter(*_ENTITY_SEED_TAGS):
+        first_elems.setdefault(element.tag, element)
+        if len(first_elems) == len(_ENTITY_SEED_TAGS):
+            break
+    
+    # Extract site ID
+    site_elem = first_elems.get('CD_SITE')
+    if site_elem is not None:
+        entity_ids['site_id'] = site_elem.get('SITE_ID')
         logger.info(f"Found site ID: {entity_ids['site_id']}")
     
-    # Find well element and extract ID
-    well_elements = root.xpath(".//CD_WELL")
-    if well_elements:
-        entity_ids['well_id'] = well_elements[0].get('WELL_ID')
+    # Extract well ID
+    well_elem = first_elems.get('CD_WELL')
+    if well_elem is not None:
+        entity_ids['well_id'] = well_elem.get('WELL_ID')
         logger.info(f"Found well ID: {entity_ids['well_id']}")
     
-    # Find wellbore element and extract ID
-    wellbore_elements = root.xpath(".//CD_WELLBORE")
-    if wellbore_elements:
-        entity_ids['wellbore_id'] = wellbore_elements[0].get('WELLBORE_ID')
+    # Extract wellbore ID
+    wellbore_elem = first_elems.get('CD_WELLBORE')
+    if wellbore_elem is not None:
+        entity_ids['wellbore_id'] = wellbore_elem.get('WELLBORE_ID')
         logger.info(f"Found wellbore ID: {entity_ids['wellbore_id']}")
     
-    # Find scenario element and extract IDs
-    scenario_elements = root.xpath(".//CD_SCENARIO")
-    if scenario_elements:
-        entity_ids['scenario_id'] = scenario_elements[0].get('SCENARIO_ID')
-        entity_ids['temp_gradient_group_id'] = scenario_elements[0].get('TEMP_GRADIENT_GROUP_ID')
-        entity_ids['pore_pressure_group_id'] = scenario_elements[0].get('PORE_PRESSURE_GROUP_ID')
-        entity_ids['frac_gradient_group_id'] = scenario_elements[0].get('FRAC_GRADIENT_GROUP_ID')
-        entity_ids['survey_header_id'] = scenario_elements[0].get('DEF_SURVEY_HEADER_ID')
-        entity_ids['datum_id'] = scenario_elements[0].get('DATUM_ID')
-        logger.debug(f"Found scenario IDs: {entity_ids['scenario_id']}, temp_group: {entity_ids['temp_gradient_group_id']}")
-    
-    # Find DLS override group and extract ID
-    dls_group_elements = root.xpath(".//TU_DLS_OVERRIDE_GROUP")
-    if dls_group_elements:
-        entity_ids['dls_override_group_id'] = dls_group_elements[0].get('DLS_OVERRIDE_GROUP_ID')
+    # Extract scenario IDs
+    scenario_elem = first_elems.get('CD_SCENARIO')
+    if scenario_elem is not None:
+        entity_ids['scenario_id'] = scenario_elem.get('SCENARIO_ID')
+        entity_ids['temp_gradient_group_id'] = scenario_elem.get('TEMP_GRADIENT_GROUP_ID')
+        entity_ids['pore_pressure_group_id'] = scenario_elem.get('PORE_PRESSURE_GROUP_ID')
+        entity_ids['frac_gradient_group_id'] = scenario_elem.get('FRAC_GRADIENT_GROUP_ID')
+        entity_ids['survey_header_id'] = scenario_elem.get('DEF_SURVEY_HEADER_ID')
+        entity_ids['datum_id'] = scenario_elem.get('DATUM_ID')
+        logger.debug("Found scenario IDs: %s, temp_group: %s",
+                     entity_ids['scenario_id'], entity_ids['temp_gradient_group_id'])
+    
+    # Extract DLS override group ID
+    dls_group_elem = first_elems.get('TU_DLS_OVERRIDE_GROUP')
+    if dls_group_elem is not None:
+        entity_ids['dls_override_group_id'] = dls_group_elem.get('DLS_OVERRIDE_GROUP_ID')
         logger.info(f"Found DLS override group ID: {entity_ids['dls_override_group_id']}")
     
     return entity_ids
 
 def update_project_info(root: ET.Element, project_info: Dict[str, Any], 
-                       entity_ids: Dict[str, str]) -> None:
+                       entity_ids: Dict[str, str],
+                       element_index: Optional[ElementIndex] = None,
+                       creation_info: Optional[Dict[str, str]] = None) -> None:
     """
     Update project information in the XML.
     
@@ -202,34 +503,23 @@ def update_project_info(root: ET.Element, project_info: Dict[str, Any],
         root: Root XML element
         project_info: Project information data
         entity_ids: Dictionary of entity IDs
+        element_index: Index from build_element_index() (optional)
+        creation_info: Audit attributes from creation_info_attributes() (optional)
     """
-    # Update site information
-    if 'site' in project_info and entity_ids['site_id']:
-        site = project_info['site']
-        if 'siteName' in site:
-            update_element_name(root, 'CD_SITE', 'SITE_ID', 
-                               entity_ids['site_id'], site['siteName'])
-    
-    # Update well information
-    if 'well' in project_info and entity_ids['well_id']:
-        well = project_info['well']
-        if 'wellCommonName' in well:
-            update_element_name(root, 'CD_WELL', 'WELL_ID', 
-                               entity_ids['well_id'], well['wellCommonName'])
-    
-    # Update wellbore information
-    if 'wellbore' in project_info and entity_ids['wellbore_id']:
-        wellbore = project_info['wellbore']
-        if 'wellboreName' in wellbore:
-            update_element_name(root, 'CD_WELLBORE', 'WELLBORE_ID', 
-                               entity_ids['wellbore_id'], wellbore['wellboreName'])
-    
-    # Update scenario name if provided
-    if entity_ids['scenario_id'] and 'well' in project_info and 'wellCommonName' in project_info['well']:
-        update_element_name(root, 'CD_SCENARIO', 'SCENARIO_ID', 
-                           entity_ids['scenario_id'], project_info['well']['wellCommonName'])
-
-def update_datum(root: ET.Element, datum: Dict[str, Any], entity_ids: Dict[str, str]) -> None:
+    # Update the site, well, wellbore and scenario names, reading each payload name once
+    for section, field, targets in _PROJECT_NAME_FIELDS:
+        value_source = project_info.get(section)
+        if not value_source or field not in value_source:
+            continue
+        name_value = value_source[field]
+        for tag_name, id_attr, id_key in targets:
+            if entity_ids[id_key]:
+                update_element_name(root, tag_name, id_attr, entity_ids[id_key], name_value,
+                                    element_index, creation_info)
+
+def update_datum(root: ET.Element, datum: Dict[str, Any], entity_ids: Dict[str, str],
+                 element_index: Optional[ElementIndex] = None,
+                 creation_info: Optional[Dict[str, str]] = None) -> None:
     """
     Update datum information in the XML.
     
@@ -237,14 +527,19 @@ def update_datum(root: ET.Element, datum: Dict[str, Any], entity_ids: Dict[str,
         root: Root XML element
         datum: Datum information data
         entity_ids: Dictionary of entity IDs
+        element_index: Index from build_element_index() (optional)
+        creation_info: Audit attributes from creation_info_attributes() (optional)
     """
     if not datum or not entity_ids['datum_id']:
         return
     
+    # Set the name and elevation on one lookup of the datum element
+    attributes = {}
     if 'datumName' in datum:
-        update_element_name(root, 'CD_DATUM', 'DATUM_ID', 
-                           entity_ids['datum_id'], datum['datumName'])
-    
+        attributes[_NAME_ATTR_BY_TAG['CD_DATUM']] = datum['datumName']
     if 'datumElevation' in datum:
-        update_element_attribute(root, 'CD_DATUM', 'DATUM_ID', 
-                                entity_ids['datum_id'], 'DATUM_ELEVATION', datum['datumElevation'])
\ No newline at end of file
+        attributes['DATUM_ELEVATION'] = datum['datumElevation']
+    
+    if attributes and update_element_attributes(root, 'CD_DATUM', 'DATUM_ID', entity_ids['datum_id'],
+                                                attributes, element_index, creation_info):
+        logger.info(f"Updated datum {entity_ids['datum_id']}: {attributes}")
\ No newline at end of file
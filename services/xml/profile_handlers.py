@@ -3,13 +3,57 @@ import logging
 from typing import Dict, List, Any, Optional, Tuple
 from lxml import etree as ET
 
-from services.xml.utils import generate_random_id, calculate_emw, format_xpath
-from services.xml.element_operations import create_element, remove_existing_elements, find_group_element
+from services.xml.utils import calculate_emw
+from services.xml.element_operations import (
+    remove_elements, replace_group_rows, find_group_element, find_elements_by_attribute,
+    find_sibling_elements_by_attribute, ElementIndex
+)
 
 logger = logging.getLogger(__name__)
 
+# Compiled XPath expressions, the group ID is bound through $group_id
+_TEMP_GRADIENT_GROUP_XPATH = ET.XPath(".//CD_TEMP_GRADIENT_GROUP[@TEMP_GRADIENT_GROUP_ID=$group_id]")
+_PORE_PRESSURE_GROUP_XPATH = ET.XPath(".//CD_PORE_PRESSURE_GROUP[@PORE_PRESSURE_GROUP_ID=$group_id]")
+_FRAC_GRADIENT_GROUP_XPATH = ET.XPath(".//CD_FRAC_GRADIENT_GROUP[@FRAC_GRADIENT_GROUP_ID=$group_id]")
+
+# (tag_name, id_attr) of the group elements in an element index
+_TEMP_GRADIENT_GROUP_KEY = ('CD_TEMP_GRADIENT_GROUP', 'TEMP_GRADIENT_GROUP_ID')
+_PORE_PRESSURE_GROUP_KEY = ('CD_PORE_PRESSURE_GROUP', 'PORE_PRESSURE_GROUP_ID')
+_FRAC_GRADIENT_GROUP_KEY = ('CD_FRAC_GRADIENT_GROUP', 'FRAC_GRADIENT_GROUP_ID')
+
+def _find_group_rows(root: ET.Element, group_xpath: ET.XPath, index_key: Tuple[str, str], tag: str,
+                     group_id: str, element_index: Optional[ElementIndex] = None
+                     ) -> Tuple[Optional[ET.Element], List[ET.Element]]:
+    """
+    Find a profile group element and the rows that sit next to it.
+    
+    Only the siblings of the group element with the group's ID are its rows.
+    When the group element is missing, the rows with the group's ID are
+    removed from the whole tree since there is nothing to attach them to.
+    
+    Args:
+        root: Root XML element
+        group_xpath: Compiled XPath finding the group element by $group_id
+        index_key: (tag_name, id_attr) of the group in the element index
+        tag: Tag name of the row elements
+        group_id: ID of the group
+        element_index: Index from build_element_index() to find the group in (optional)
+        
+    Returns:
+        Tuple of (group element, row elements), the group element is None if it was not found
+    """
+    group_attr = index_key[1]
+    group_elem = find_group_element(root, group_xpath, group_id, element_index, index_key)
+    
+    if group_elem is None:
+        remove_elements(find_elements_by_attribute(root, tag, group_attr, group_id))
+        return None, []
+    
+    return group_elem, find_sibling_elements_by_attribute(group_elem, tag, group_attr, group_id)
+
 def update_temperature_profiles(root: ET.Element, well_id: str, wellbore_id: str, 
-                               temp_group_id: str, temp_profiles: List[Dict[str, Any]]) -> bool:
+                               temp_group_id: str, temp_profiles: List[Dict[str, Any]],
+                               element_index: Optional[ElementIndex] = None) -> bool:
     """
     Update temperature profiles in the XML.
     
@@ -19,6 +63,7 @@ def update_temperature_profiles(root: ET.Element, well_id: str, wellbore_id: str
         wellbore_id: Wellbore ID
         temp_group_id: Temperature gradient group ID
         temp_profiles: List of temperature profile data
+        element_index: Index from build_element_index() to find the group in (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -26,58 +71,59 @@ def update_temperature_profiles(root: ET.Element, well_id: str, wellbore_id: str
     try:
         logger.info(f"Updating temperature profiles for group {temp_group_id}")
         
-        # Remove existing temperature gradient entries
-        remove_existing_elements(root, f".//CD_TEMP_GRADIENT[@TEMP_GRADIENT_GROUP_ID='{temp_group_id}']")
-        
-        # Update surface temperature in the group if provided
-        surface_temp = next((profile.get('temperature') for profile in temp_profiles 
-                            if profile.get('depth') == 0), None)
-        
-        if surface_temp is not None:
-            xpath = format_xpath('CD_TEMP_GRADIENT_GROUP', 'TEMP_GRADIENT_GROUP_ID', temp_group_id)
-            elements = root.xpath(xpath)
-            if elements:
-                elements[0].set('SURFACE_AMBIENT_TEMP', str(surface_temp))
-                logger.info(f"Updated surface temperature to {surface_temp}")
-        
         # Find the temperature gradient group
-        group_result = find_group_element(
-            root,
-            f".//CD_TEMP_GRADIENT_GROUP[@TEMP_GRADIENT_GROUP_ID='{temp_group_id}']",
-            temp_group_id
-        )
+        group_elem = find_group_element(root, _TEMP_GRADIENT_GROUP_XPATH, temp_group_id,
+                                        element_index, _TEMP_GRADIENT_GROUP_KEY)
         
-        if not group_result:
+        if group_elem is None:
+            remove_elements(find_elements_by_attribute(root, 'CD_TEMP_GRADIENT', 'TEMP_GRADIENT_GROUP_ID',
+                                                       temp_group_id))
             return False
         
-        group_elem, parent_elem, group_index = group_result
+        # Existing temperature gradient entries next to the group, replaced below
+        existing = find_sibling_elements_by_attribute(group_elem, 'CD_TEMP_GRADIENT', 'TEMP_GRADIENT_GROUP_ID',
+                                                      temp_group_id)
+        
+        # Split off the surface temperature and the profiles with depth > 0 in one pass
+        surface_profile = None
+        depth_profiles = []
+        for profile in temp_profiles:
+            depth = profile.get('depth')
+            if depth == 0:
+                if surface_profile is None:
+                    surface_profile = profile
+            elif (depth or 0) > 0:
+                depth_profiles.append(profile)
         
-        # Filter profiles with depth > 0 and sort by depth in descending order (deepest first)
-        depth_profiles = [p for p in temp_profiles if p.get('depth', 0) > 0]
+        # Update surface temperature in the group if provided
+        surface_temp = surface_profile.get('temperature') if surface_profile is not None else None
+        if surface_temp is not None:
+            group_elem.set('SURFACE_AMBIENT_TEMP', str(surface_temp))
+            logger.info(f"Updated surface temperature to {surface_temp}")
+        
+        # Sort profiles by depth in descending order (deepest first)
         depth_profiles.sort(key=lambda x: x.get('depth', 0), reverse=True)
         
-        # Add temperature profiles directly after the group element
-        for i, profile in enumerate(depth_profiles):
-            # Generate a new ID for each gradient element
-            temp_id = generate_random_id()
+        # Build the temperature gradient rows, the ID is assigned by replace_group_rows
+        rows = []
+        for profile in depth_profiles:
+            temperature = str(profile.get('temperature'))
+            depth = str(profile.get('depth'))
             
-            # Create element attributes
-            element_attrs = {
+            rows.append({
                 'WELL_ID': well_id,
                 'WELLBORE_ID': wellbore_id,
                 'TEMP_GRADIENT_GROUP_ID': temp_group_id,
-                'TEMP_GRADIENT_ID': temp_id,
-                'TEMPERATURE': str(profile.get('temperature')),
-                'TVD': str(profile.get('depth'))
-            }
-            
-            # Create the element
-            element = create_element('CD_TEMP_GRADIENT', element_attrs)
+                'TEMP_GRADIENT_ID': None,
+                'TEMPERATURE': temperature,
+                'TVD': depth
+            })
             
-            # Insert the element right after the group element
-            parent_elem.insert(group_index + 1 + i, element)
-            
-            logger.info(f"Added temperature gradient at depth {profile.get('depth')}: {profile.get('temperature')}°F")
+            logger.debug("Added temperature gradient at depth %s: %s°F", depth, temperature)
+        
+        # Write the rows directly after the group element
+        replace_group_rows(group_elem, existing, 'CD_TEMP_GRADIENT', rows, 'TEMP_GRADIENT_ID')
+        logger.info(f"Added {len(rows)} temperature gradients")
         
         return True
     except Exception as e:
@@ -85,7 +131,8 @@ def update_temperature_profiles(root: ET.Element, well_id: str, wellbore_id: str
         return False
 
 def update_pressure_profiles(root: ET.Element, well_id: str, wellbore_id: str, pore_group_id: str, 
-                            frac_group_id: str, pressure_profiles: List[Dict[str, Any]]) -> bool:
+                            frac_group_id: str, pressure_profiles: List[Dict[str, Any]],
+                            element_index: Optional[ElementIndex] = None) -> bool:
     """
     Update pressure profiles in the XML.
     
@@ -96,6 +143,7 @@ def update_pressure_profiles(root: ET.Element, well_id: str, wellbore_id: str, p
         pore_group_id: Pore pressure group ID
         frac_group_id: Frac gradient group ID
         pressure_profiles: List of pressure profile data
+        element_index: Index from build_element_index() to find the groups in (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -103,142 +151,131 @@ def update_pressure_profiles(root: ET.Element, well_id: str, wellbore_id: str, p
     try:
         logger.info("Updating pressure profiles")
         
-        # Remove existing pressure entries for both pore and frac
-        remove_existing_elements(root, ".//CD_PORE_PRESSURE")
-        remove_existing_elements(root, ".//CD_FRAC_GRADIENT")
+        # Find the pore and frac groups and their existing pressure entries
+        pore_group_elem, pore_existing = _find_group_rows(root, _PORE_PRESSURE_GROUP_XPATH, _PORE_PRESSURE_GROUP_KEY,
+                                                          'CD_PORE_PRESSURE', pore_group_id, element_index)
+        frac_group_elem, frac_existing = _find_group_rows(root, _FRAC_GRADIENT_GROUP_XPATH, _FRAC_GRADIENT_GROUP_KEY,
+                                                          'CD_FRAC_GRADIENT', frac_group_id, element_index)
         
-        # Group pressure profiles by type
-        pore_pressures = [p for p in pressure_profiles if p.get('pressureType', '') == 'Pore']
-        frac_pressures = [p for p in pressure_profiles if p.get('pressureType', '') == 'Frac']
+        # Group pressure profiles by type in a single pass
+        pore_pressures = []
+        frac_pressures = []
+        for profile in pressure_profiles:
+            pressure_type = profile.get('pressureType', '')
+            if pressure_type == 'Pore':
+                pore_pressures.append(profile)
+            elif pressure_type == 'Frac':
+                frac_pressures.append(profile)
         
         # Sort pressure profiles by depth in descending order (deepest first)
         pore_pressures.sort(key=lambda x: x.get('depth', 0), reverse=True)
         frac_pressures.sort(key=lambda x: x.get('depth', 0), reverse=True)
         
         # Process pore pressures
-        if pore_pressures:
-            pore_group_result = find_group_element(
-                root,
-                f".//CD_PORE_PRESSURE_GROUP[@PORE_PRESSURE_GROUP_ID='{pore_group_id}']",
-                pore_group_id
-            )
-            
-            if pore_group_result:
-                _, parent_elem, group_index = pore_group_result
-                add_pore_pressure_elements(root, pore_pressures, well_id, wellbore_id, 
-                                          pore_group_id, parent_elem, group_index)
-            else:
-                logger.warning(f"Pore pressure group with ID {pore_group_id} not found")
+        if pore_group_elem is not None:
+            rows = _pore_pressure_rows(pore_pressures, well_id, wellbore_id, pore_group_id)
+            replace_group_rows(pore_group_elem, pore_existing, 'CD_PORE_PRESSURE', rows, 'PORE_PRESSURE_ID')
+            logger.info(f"Added {len(rows)} pore pressures")
+        elif pore_pressures:
+            logger.warning(f"Pore pressure group with ID {pore_group_id} not found")
         
         # Process frac gradients
-        if frac_pressures:
-            frac_group_result = find_group_element(
-                root,
-                f".//CD_FRAC_GRADIENT_GROUP[@FRAC_GRADIENT_GROUP_ID='{frac_group_id}']",
-                frac_group_id
-            )
-            
-            if frac_group_result:
-                _, parent_elem, group_index = frac_group_result
-                add_frac_gradient_elements(root, frac_pressures, well_id, wellbore_id, 
-                                          frac_group_id, parent_elem, group_index)
-            else:
-                logger.warning(f"Frac gradient group with ID {frac_group_id} not found")
+        if frac_group_elem is not None:
+            rows = _frac_gradient_rows(frac_pressures, well_id, wellbore_id, frac_group_id)
+            replace_group_rows(frac_group_elem, frac_existing, 'CD_FRAC_GRADIENT', rows, 'FRAC_GRADIENT_ID')
+            logger.info(f"Added {len(rows)} frac gradients")
+        elif frac_pressures:
+            logger.warning(f"Frac gradient group with ID {frac_group_id} not found")
         
         return True
     except Exception as e:
         logger.error(f"Error updating pressure profiles: {str(e)}", exc_info=True)
         return False
 
-def add_pore_pressure_elements(root: ET.Element, pressures: List[Dict[str, Any]], well_id: str, 
-                              wellbore_id: str, group_id: str, parent_elem: ET.Element, 
-                              start_index: int) -> None:
+def _pressure_values(profile: Dict[str, Any]) -> Tuple[str, str, str]:
     """
-    Add pore pressure elements to the XML.
+    Get the pressure, depth and EMW attribute values of a pressure profile.
+    
+    The EMW is calculated from pressure and depth when it is not provided.
+    
+    Args:
+        profile: Pressure profile data
+        
+    Returns:
+        Tuple of (pressure, depth, emw) as attribute strings
+    """
+    pressure = profile.get('pressure', 0)
+    depth = profile.get('depth', 0)
+    
+    emw = profile.get('emw')
+    if emw is None and depth > 0:
+        emw = calculate_emw(pressure, depth)
+    
+    return str(pressure), str(depth), str(emw) if emw is not None else '0.0'
+
+def _pore_pressure_rows(pressures: List[Dict[str, Any]], well_id: str, wellbore_id: str,
+                        group_id: str) -> List[Dict[str, Any]]:
+    """
+    Build the pore pressure rows of a group.
     
     Args:
-        root: Root XML element
         pressures: List of pressure profile data
         well_id: Well ID
         wellbore_id: Wellbore ID
         group_id: Pore pressure group ID
-        parent_elem: Parent element to add to
-        start_index: Starting index for insertion
+        
+    Returns:
+        List of attribute dictionaries, the ID is assigned by replace_group_rows
     """
-    for i, profile in enumerate(pressures):
-        # Generate a new ID for each element
-        pressure_id = generate_random_id()
-        
-        # Calculate EMW if not provided
-        emw = profile.get('emw')
-        if emw is None and profile.get('depth', 0) > 0:
-            pressure = profile.get('pressure', 0)
-            depth = profile.get('depth', 0)
-            emw = calculate_emw(pressure, depth)
-        
-        # Create element attributes
-        element_attrs = {
+    rows = []
+    for profile in pressures:
+        pressure, depth, emw = _pressure_values(profile)
+        
+        rows.append({
             'WELL_ID': well_id,
             'WELLBORE_ID': wellbore_id,
             'PORE_PRESSURE_GROUP_ID': group_id,
-            'PORE_PRESSURE_ID': pressure_id,
-            'PORE_PRESSURE': str(profile.get('pressure')),
-            'TVD': str(profile.get('depth')),
+            'PORE_PRESSURE_ID': None,
+            'PORE_PRESSURE': pressure,
+            'TVD': depth,
             'IS_PERMEABLE_ZONE': 'Y',
-            'PORE_PRESSURE_EMW': str(emw) if emw is not None else '0.0'
-        }
-        
-        # Create the element
-        element = create_element('CD_PORE_PRESSURE', element_attrs)
+            'PORE_PRESSURE_EMW': emw
+        })
         
-        # Insert the element
-        parent_elem.insert(start_index + 1 + i, element)
-        
-        logger.info(f"Added pore pressure at depth {profile.get('depth')}: "
-                   f"{profile.get('pressure')} {profile.get('units', 'psi')}")
+        logger.debug("Added pore pressure at depth %s: %s %s",
+                     depth, pressure, profile.get('units', 'psi'))
+    
+    return rows
 
-def add_frac_gradient_elements(root: ET.Element, pressures: List[Dict[str, Any]], well_id: str, 
-                              wellbore_id: str, group_id: str, parent_elem: ET.Element, 
-                              start_index: int) -> None:
+def _frac_gradient_rows(pressures: List[Dict[str, Any]], well_id: str, wellbore_id: str,
+                        group_id: str) -> List[Dict[str, Any]]:
     """
-    Add frac gradient elements to the XML.
+    Build the frac gradient rows of a group.
     
     Args:
-        root: Root XML element
         pressures: List of pressure profile data
         well_id: Well ID
         wellbore_id: Wellbore ID
         group_id: Frac gradient group ID
-        parent_elem: Parent element to add to
-        start_index: Starting index for insertion
+        
+    Returns:
+        List of attribute dictionaries, the ID is assigned by replace_group_rows
     """
-    for i, profile in enumerate(pressures):
-        # Generate a new ID for each element
-        gradient_id = generate_random_id()
-        
-        # Calculate EMW if not provided
-        emw = profile.get('emw')
-        if emw is None and profile.get('depth', 0) > 0:
-            pressure = profile.get('pressure', 0)
-            depth = profile.get('depth', 0)
-            emw = calculate_emw(pressure, depth)
-        
-        # Create element attributes
-        element_attrs = {
+    rows = []
+    for profile in pressures:
+        pressure, depth, emw = _pressure_values(profile)
+        
+        rows.append({
             'WELL_ID': well_id,
             'WELLBORE_ID': wellbore_id,
             'FRAC_GRADIENT_GROUP_ID': group_id,
-            'FRAC_GRADIENT_ID': gradient_id,
-            'FRAC_GRADIENT_PRESSURE': str(profile.get('pressure')),
-            'TVD': str(profile.get('depth')),
-            'FRAC_GRADIENT_EMW': str(emw) if emw is not None else '0.0'
-        }
+            'FRAC_GRADIENT_ID': None,
+            'FRAC_GRADIENT_PRESSURE': pressure,
+            'TVD': depth,
+            'FRAC_GRADIENT_EMW': emw
+        })
         
-        # Create the element
-        element = create_element('CD_FRAC_GRADIENT', element_attrs)
-        
-        # Insert the element
-        parent_elem.insert(start_index + 1 + i, element)
-        
-        logger.info(f"Added frac gradient at depth {profile.get('depth')}: "
-                   f"{profile.get('pressure')} {profile.get('units', 'psi')}")
\ No newline at end of file
+        logger.debug("Added frac gradient at depth %s: %s %s",
+                     depth, pressure, profile.get('units', 'psi'))
+    
+    return rows
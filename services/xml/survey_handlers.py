@@ -1,15 +1,21 @@
 # services/xml/survey_handlers.py
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from lxml import etree as ET
 
-from services.xml.utils import generate_random_id
-from services.xml.element_operations import create_element, remove_existing_elements
+from services.xml.element_operations import (
+    remove_elements, replace_group_rows, find_indexed_elements, find_elements_by_attribute,
+    find_sibling_elements_by_attribute, ElementIndex
+)
 
 logger = logging.getLogger(__name__)
 
+# Compiled XPath for the header lookup without an element index, the header ID is bound through $header_id
+_SURVEY_HEADER_XPATH = ET.XPath(".//CD_DEFINITIVE_SURVEY_HEADER[@DEF_SURVEY_HEADER_ID=$header_id]")
+
 def update_survey_stations(root: ET.Element, well_id: str, wellbore_id: str, 
-                          survey_header_id: str, survey_stations: List[Dict[str, Any]]) -> bool:
+                          survey_header_id: str, survey_stations: List[Dict[str, Any]],
+                          element_index: Optional[ElementIndex] = None) -> bool:
     """
     Update survey stations in the XML.
     
@@ -19,6 +25,7 @@ def update_survey_stations(root: ET.Element, well_id: str, wellbore_id: str,
         wellbore_id: Wellbore ID
         survey_header_id: Survey header ID
         survey_stations: List of survey station data
+        element_index: Index from build_element_index() to find the header in (optional)
         
     Returns:
         bool: True if successful, False otherwise
@@ -26,47 +33,46 @@ def update_survey_stations(root: ET.Element, well_id: str, wellbore_id: str,
     try:
         logger.info(f"Updating survey stations for header {survey_header_id}")
         
-        # Remove existing survey station entries
-        xpath = f".//CD_DEFINITIVE_SURVEY_STATION[@DEF_SURVEY_HEADER_ID='{survey_header_id}']"
-        remove_existing_elements(root, xpath)
-        
         # Find the survey header element
-        header_xpath = f".//CD_DEFINITIVE_SURVEY_HEADER[@DEF_SURVEY_HEADER_ID='{survey_header_id}']"
-        header_elements = root.xpath(header_xpath)
+        header_elem = next(iter(find_indexed_elements(
+            root, _SURVEY_HEADER_XPATH, 'CD_DEFINITIVE_SURVEY_HEADER', 'DEF_SURVEY_HEADER_ID',
+            survey_header_id, element_index, header_id=survey_header_id)), None)
         
-        if not header_elements:
+        if header_elem is None:
+            remove_elements(find_elements_by_attribute(root, 'CD_DEFINITIVE_SURVEY_STATION', 'DEF_SURVEY_HEADER_ID',
+                                                       survey_header_id))
             logger.warning(f"Survey header with ID {survey_header_id} not found")
             return False
         
-        # Update the header name if provided
-        if survey_stations and 'name' in survey_stations[0]:
-            header_elements[0].set('NAME', survey_stations[0]['name'])
-            logger.info(f"Updated survey header name to: {survey_stations[0]['name']}")
-        
-        # Get the header element and its parent
-        header_elem = header_elements[0]
-        parent_elem = header_elem.getparent()
+        # Existing survey station entries next to the header, replaced below
+        existing = find_sibling_elements_by_attribute(header_elem, 'CD_DEFINITIVE_SURVEY_STATION',
+                                                      'DEF_SURVEY_HEADER_ID', survey_header_id)
         
-        # Get the index of the header element in its parent's children
-        header_index = parent_elem.index(header_elem)
+        # Update the header name if provided
+        header_name = survey_stations[0].get('name') if survey_stations else None
+        if header_name:
+            header_elem.set('NAME', header_name)
+            logger.info(f"Updated survey header name to: {header_name}")
         
         # Sort survey stations by MD in descending order (deepest first)
         sorted_stations = sorted(survey_stations, key=lambda x: float(x.get('md', 0)), reverse=True)
         
-        # Add new survey station elements
+        # Build the survey station rows, the ID is assigned by replace_group_rows
+        rows = []
         for i, station in enumerate(sorted_stations):
-            # Generate a new ID for each station
-            station_id = generate_random_id()
+            azimuth = str(station.get('azimuth'))
+            inclination = str(station.get('inclination'))
+            md = str(station.get('md'))
             
             # Create basic attributes dictionary
             attributes = {
                 'WELL_ID': well_id,
                 'WELLBORE_ID': wellbore_id,
                 'DEF_SURVEY_HEADER_ID': survey_header_id,
-                'DEFINITIVE_SURVEY_ID': station_id,
-                'AZIMUTH': str(station.get('azimuth')),
-                'INCLINATION': str(station.get('inclination')),
-                'MD': str(station.get('md')),
+                'DEFINITIVE_SURVEY_ID': None,
+                'AZIMUTH': azimuth,
+                'INCLINATION': inclination,
+                'MD': md,
                 'SEQUENCE_NO': str(float(i)),
                 'DATA_ENTRY_MODE': str(station.get('dataEntryMode', '0'))
             }
@@ -77,14 +83,13 @@ def update_survey_stations(root: ET.Element, well_id: str, wellbore_id: str,
             if 'doglegSeverity' in station:
                 attributes['DOGLEG_SEVERITY'] = str(station['doglegSeverity'])
             
-            # Create the element
-            element = create_element('CD_DEFINITIVE_SURVEY_STATION', attributes)
-            
-            # Insert the element
-            parent_elem.insert(header_index + 1 + i, element)
+            rows.append(attributes)
             
-            logger.info(f"Added survey station at MD {station.get('md')}: "
-                       f"AZ={station.get('azimuth')}, INC={station.get('inclination')}")
+            logger.debug("Added survey station at MD %s: AZ=%s, INC=%s", md, azimuth, inclination)
+        
+        # Write the rows directly after the header element
+        replace_group_rows(header_elem, existing, 'CD_DEFINITIVE_SURVEY_STATION', rows, 'DEFINITIVE_SURVEY_ID')
+        logger.info(f"Added {len(rows)} survey stations")
         
         logger.info("Survey stations update completed successfully")
         return True
@@ -1,13 +1,13 @@
 # services/xml/template_editor.py
 import logging
 import os
-import re
 from typing import Dict, List, Any, Optional
 from lxml import etree as ET
 
 from services.xml.element_operations import (
     update_element_attribute, update_element_name, extract_entity_ids,
-    update_project_info, update_datum
+    build_element_index, creation_info_attributes, update_project_info, update_datum,
+    ElementIndex
 )
 from services.xml.profile_handlers import (
     update_temperature_profiles, update_pressure_profiles
@@ -16,9 +16,19 @@ from services.xml.dls_handlers import update_dls_overrides
 from services.xml.survey_handlers import update_survey_stations
 from services.xml.binary_data import inject_binary_data
 from services.xml.casing_handlers import update_casing_assemblies
+from utils.xml_helpers import EDM_PROLOG
 
 logger = logging.getLogger(__name__)
 
+# Start of the DataServices processing instruction of a template
+_DATASERVICES_PI_START = b'<?DataServices'
+
+# Encoded EDM prolog written ahead of the root element
+_EDM_PROLOG = EDM_PROLOG.encode('utf-8')
+
+# Write buffer size used when saving a document to disk
+_SAVE_BUFFER_SIZE = 1 << 20
+
 class XMLTemplateEditor:
     """
     Service for editing existing XML templates while preserving IDs and relationships.
@@ -48,17 +58,22 @@ class XMLTemplateEditor:
             bool: True if successfully loaded, False otherwise
         """
         try:
-            # Read the file content to extract processing instructions
-            with open(template_path, 'r', encoding='utf-8') as f:
+            # Read the file once, the same bytes are scanned and parsed
+            with open(template_path, 'rb') as f:
                 content = f.read()
-                # Extract DataServices PI if present
-                ds_match = re.search(r'<\?DataServices[^>]*\?>', content)
-                if ds_match:
-                    self.dataservices_pi = ds_match.group(0)
+            
+            # Extract DataServices PI if present
+            pi_start = content.find(_DATASERVICES_PI_START)
+            if pi_start != -1:
+                pi_end = content.find(b'?>', pi_start)
+                if pi_end != -1:
+                    self.dataservices_pi = content[pi_start:pi_end + 2].decode('utf-8')
             
             self.template_path = template_path
-            self.tree = ET.parse(template_path)
-            self.root = self.tree.getroot()
+            # Drop whitespace-only text nodes, the layout is restored by ET.indent() on output
+            parser = ET.XMLParser(remove_blank_text=True, huge_tree=True, collect_ids=False)
+            self.root = ET.fromstring(content, parser, base_url=template_path)
+            self.tree = self.root.getroottree()
             logger.info(f"Successfully loaded template from {template_path}")
             return True
         except Exception as e:
@@ -76,13 +91,36 @@ class XMLTemplateEditor:
             bool: True if successfully saved, False otherwise
         """
         try:
-            self.tree.write(output_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+            ET.indent(self.root, space='')
+            
+            # Stream the document to disk instead of serializing it in memory first,
+            # through a large file buffer so the serializer's small chunks are batched
+            with open(output_path, 'wb', buffering=_SAVE_BUFFER_SIZE) as f, \
+                    ET.xmlfile(f, encoding='UTF-8') as xf:
+                xf.write_declaration()
+                # Processing instructions before the root, e.g. the DataServices PI
+                for node in reversed(list(self.root.itersiblings(preceding=True))):
+                    xf.write(node, pretty_print=True)
+                xf.write(self.root, pretty_print=True)
             logger.info(f"Successfully saved XML to {output_path}")
             return True
         except Exception as e:
             logger.error(f"Error saving XML: {str(e)}")
             return False
     
+    def get_xml_bytes(self) -> bytes:
+        """
+        Get the XML as UTF-8 encoded bytes with proper formatting.
+        
+        Returns:
+            bytes: Formatted XML document
+        """
+        # Put every element on its own line, matching the template layout
+        ET.indent(self.root, space='')
+        
+        # Prefix the standard declaration including the DataServices PI
+        return _EDM_PROLOG + ET.tostring(self.root, encoding='utf-8')
+    
     def get_xml_string(self) -> str:
         """
         Get the XML as a string with proper formatting.
@@ -90,14 +128,7 @@ class XMLTemplateEditor:
         Returns:
             str: Formatted XML string
         """
-        # Get the XML string with pretty printing
-        xml_string = ET.tostring(self.root, encoding='utf-8', xml_declaration=True, pretty_print=True).decode('utf-8')
-        
-        # Replace the XML declaration with the standard format including DataServices PI
-        xml_string = xml_string.replace('<?xml version=\'1.0\' encoding=\'utf-8\'?>', 
-                        '<?xml version="1.0" standalone="no"?>\n<?DataServices DB_Major_Version=14;DB_Minor_Version=00;DB_Build_Version=000;DB_Version=EDM 5000.14.0 (14.00.00.000);expandPoint=CD_SCENARIO;?>')
-        
-        return xml_string
+        return self.get_xml_bytes().decode('utf-8')
     
     def update_element_attribute(self, tag_name: str, id_attr: str, id_value: str, 
                                 attr_name: str, attr_value: Any) -> bool:
@@ -132,7 +163,8 @@ class XMLTemplateEditor:
         return update_element_name(self.root, tag_name, id_attr, id_value, name_value)
     
     def update_temperature_profiles(self, well_id: str, wellbore_id: str, 
-                                    temp_group_id: str, temp_profiles: List[Dict[str, Any]]) -> bool:
+                                    temp_group_id: str, temp_profiles: List[Dict[str, Any]],
+                                    element_index: Optional[ElementIndex] = None) -> bool:
         """
         Update temperature profiles in the XML.
         
@@ -141,15 +173,17 @@ class XMLTemplateEditor:
             wellbore_id: Wellbore ID
             temp_group_id: Temperature gradient group ID
             temp_profiles: List of temperature profile data
+            element_index: Index from build_element_index() to find the group in (optional)
             
         Returns:
             bool: True if successful, False otherwise
         """
         return update_temperature_profiles(self.root, well_id, wellbore_id, 
-                                          temp_group_id, temp_profiles)
+                                          temp_group_id, temp_profiles, element_index)
     
     def update_pressure_profiles(self, well_id: str, wellbore_id: str, pore_group_id: str, 
-                                frac_group_id: str, pressure_profiles: List[Dict[str, Any]]) -> bool:
+                                frac_group_id: str, pressure_profiles: List[Dict[str, Any]],
+                                element_index: Optional[ElementIndex] = None) -> bool:
         """
         Update pressure profiles in the XML.
         
@@ -159,15 +193,18 @@ class XMLTemplateEditor:
             pore_group_id: Pore pressure group ID
             frac_group_id: Frac gradient group ID
             pressure_profiles: List of pressure profile data
+            element_index: Index from build_element_index() to find the groups in (optional)
             
         Returns:
             bool: True if successful, False otherwise
         """
         return update_pressure_profiles(self.root, well_id, wellbore_id, 
-                                       pore_group_id, frac_group_id, pressure_profiles)
+                                       pore_group_id, frac_group_id, pressure_profiles, element_index)
     
     def update_dls_overrides(self, well_id: str, wellbore_id: str, scenario_id: str, 
-                            dls_group_id: str, dls_overrides: List[Dict[str, Any]]) -> bool:
+                            dls_group_id: str, dls_overrides: List[Dict[str, Any]],
+                            creation_info: Optional[Dict[str, str]] = None,
+                            element_index: Optional[ElementIndex] = None) -> bool:
         """
         Update dogleg severity overrides in the XML.
         
@@ -177,15 +214,18 @@ class XMLTemplateEditor:
             scenario_id: Scenario ID
             dls_group_id: DLS override group ID
             dls_overrides: List of DLS override data
+            creation_info: Audit attributes to stamp on the overrides (optional)
+            element_index: Index from build_element_index() to find the group in (optional)
             
         Returns:
             bool: True if successful, False otherwise
         """
         return update_dls_overrides(self.root, well_id, wellbore_id, scenario_id, 
-                                   dls_group_id, dls_overrides)
+                                   dls_group_id, dls_overrides, creation_info, element_index)
     
     def update_survey_stations(self, well_id: str, wellbore_id: str, 
-                              survey_header_id: str, survey_stations: List[Dict[str, Any]]) -> bool:
+                              survey_header_id: str, survey_stations: List[Dict[str, Any]],
+                              element_index: Optional[ElementIndex] = None) -> bool:
         """
         Update survey stations in the XML.
         
@@ -194,15 +234,17 @@ class XMLTemplateEditor:
             wellbore_id: Wellbore ID
             survey_header_id: Survey header ID
             survey_stations: List of survey station data
+            element_index: Index from build_element_index() to find the header in (optional)
             
         Returns:
             bool: True if successful, False otherwise
         """
         return update_survey_stations(self.root, well_id, wellbore_id, 
-                                     survey_header_id, survey_stations)
+                                     survey_header_id, survey_stations, element_index)
     
     def update_casing_assemblies(self, well_id: str, wellbore_id: str,
-                               assemblies: List[Dict[str, Any]]) -> bool:
+                               assemblies: List[Dict[str, Any]],
+                               creation_info: Optional[Dict[str, str]] = None) -> bool:
         """
         Update casing assemblies and their components in the XML.
         
@@ -210,11 +252,12 @@ class XMLTemplateEditor:
             well_id: Well ID
             wellbore_id: Wellbore ID
             assemblies: List of assembly data
+            creation_info: Audit attributes to stamp on new elements (optional)
             
         Returns:
             bool: True if successful, False otherwise
         """
-        return update_casing_assemblies(self.root, well_id, wellbore_id, assemblies)
+        return update_casing_assemblies(self.root, well_id, wellbore_id, assemblies, creation_info)
     
     def update_from_payload(self, payload: Dict[str, Any], add_binary_data: bool = False) -> bool:
         """
@@ -233,8 +276,16 @@ class XMLTemplateEditor:
             # Extract key IDs from the template
             entity_ids = extract_entity_ids(self.root)
             
+            # Index the entity and group elements once for the lookups by ID;
+            # none of the updaters below add or remove these elements
+            element_index = build_element_index(self.root)
+            
+            # One audit timestamp for every element created or modified by this payload
+            creation_info = creation_info_attributes()
+            
             # Update project information
-            update_project_info(self.root, payload.get('projectInfo', {}), entity_ids)
+            update_project_info(self.root, payload.get('projectInfo', {}), entity_ids,
+                                element_index, creation_info)
             
             # Update formation inputs
             formation_inputs = payload.get('formationInputs', {})
@@ -242,70 +293,78 @@ class XMLTemplateEditor:
             wellbore_id = entity_ids['wellbore_id']
             scenario_id = entity_ids['scenario_id']
             
+            # Every formation and casing update needs the well and wellbore IDs
+            has_wellbore = bool(well_id and wellbore_id)
+            
             # Update temperature profiles
-            if ('temperatureProfiles' in formation_inputs and well_id and 
-                wellbore_id and entity_ids['temp_gradient_group_id']):
+            temp_group_id = entity_ids['temp_gradient_group_id']
+            if has_wellbore and temp_group_id and 'temperatureProfiles' in formation_inputs:
                 self.update_temperature_profiles(
                     well_id, 
                     wellbore_id,
-                    entity_ids['temp_gradient_group_id'], 
-                    formation_inputs['temperatureProfiles']
+                    temp_group_id, 
+                    formation_inputs['temperatureProfiles'],
+                    element_index
                 )
             
             # Update pressure profiles
-            if ('pressureProfiles' in formation_inputs and well_id and wellbore_id and 
-                entity_ids['pore_pressure_group_id'] and entity_ids['frac_gradient_group_id']):
+            pore_group_id = entity_ids['pore_pressure_group_id']
+            frac_group_id = entity_ids['frac_gradient_group_id']
+            if has_wellbore and pore_group_id and frac_group_id and 'pressureProfiles' in formation_inputs:
                 self.update_pressure_profiles(
                     well_id,
                     wellbore_id,
-                    entity_ids['pore_pressure_group_id'],
-                    entity_ids['frac_gradient_group_id'],
-                    formation_inputs['pressureProfiles']
+                    pore_group_id,
+                    frac_group_id,
+                    formation_inputs['pressureProfiles'],
+                    element_index
                 )
             
             # Update DLS overrides
-            if ('dlsOverrideGroup' in formation_inputs and 
-                'overrides' in formation_inputs['dlsOverrideGroup'] and 
-                well_id and wellbore_id and scenario_id and entity_ids['dls_override_group_id']):
+            dls_group_id = entity_ids['dls_override_group_id']
+            dls_override_group = formation_inputs.get('dlsOverrideGroup', {})
+            if has_wellbore and scenario_id and dls_group_id and 'overrides' in dls_override_group:
                 self.update_dls_overrides(
                     well_id,
                     wellbore_id,
                     scenario_id,
-                    entity_ids['dls_override_group_id'],
-                    formation_inputs['dlsOverrideGroup']['overrides']
+                    dls_group_id,
+                    dls_override_group['overrides'],
+                    creation_info,
+                    element_index
                 )
             
             # Update survey header and stations
-            if ('surveyHeader' in formation_inputs and 
-                'stations' in formation_inputs['surveyHeader'] and 
-                well_id and wellbore_id and entity_ids['survey_header_id']):
+            survey_header_id = entity_ids['survey_header_id']
+            survey_header = formation_inputs.get('surveyHeader', {})
+            if has_wellbore and survey_header_id and 'stations' in survey_header:
                 self.update_survey_stations(
                     well_id,
                     wellbore_id,
-                    entity_ids['survey_header_id'],
-                    formation_inputs['surveyHeader']['stations']
+                    survey_header_id,
+                    survey_header['stations'],
+                    element_index
                 )
             
             # Update datum
-            update_datum(self.root, payload.get('datum', {}), entity_ids)
+            update_datum(self.root, payload.get('datum', {}), entity_ids, element_index, creation_info)
             
             # Update casing schematics
             casing_schematics = payload.get('casingSchematics', {})
-            if 'assemblies' in casing_schematics and well_id and wellbore_id:
+            if has_wellbore and 'assemblies' in casing_schematics:
                 self.update_casing_assemblies(
                     well_id,
                     wellbore_id,
-                    casing_schematics['assemblies']
+                    casing_schematics['assemblies'],
+                    creation_info
                 )
             
-            logger.info("Template update from payload completed successfully")
-        
             # Add binary data from template if requested
             if add_binary_data:
                 logger.info("Adding binary data to the XML")
                 inject_binary_data(self.root, self.template_path)
-                    
-            logger.info("Template update complete")
+            
+            logger.info("Template update from payload completed successfully")
             return True
 
         except Exception as e:
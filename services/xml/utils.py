@@ -2,14 +2,18 @@
 import random
 import string
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Optional, List
+from lxml import etree as ET
 
 logger = logging.getLogger(__name__)
 
+# Characters used in generated IDs
+_ID_CHARS = string.ascii_letters + string.digits
+
 def generate_random_id(length: int = 5) -> str:
     """Generate a random alphanumeric ID of specified length."""
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
+    return ''.join(random.choices(_ID_CHARS, k=length))
 
 def calculate_emw(pressure: float, depth: float) -> float:
     """
@@ -26,16 +30,20 @@ def calculate_emw(pressure: float, depth: float) -> float:
         return 0.0
     return pressure / (0.052 * depth)
 
-def format_xpath(tag: str, attr: str, value: str) -> str:
+@lru_cache(maxsize=None)
+def compile_id_xpath(tag: str, attr: str) -> ET.XPath:
     """
-    Format an XPath expression for finding elements.
+    Compile an XPath expression for finding elements by tag and attribute value.
+    
+    The expression is compiled once per (tag, attr) pair; the attribute value
+    is bound at evaluation time through the ``$value`` variable, e.g.
+    ``compile_id_xpath('CD_SITE', 'SITE_ID')(root, value=site_id)``.
     
     Args:
         tag: Element tag name
         attr: Attribute name
-        value: Attribute value
         
     Returns:
-        str: Formatted XPath expression
+        XPath: Compiled XPath expression
     """
-    return f".//{tag}[@{attr}='{value}']"
\ No newline at end of file
+    return ET.XPath(f".//{tag}[@{attr}=$value]")
\ No newline at end of file
@@ -6,6 +6,15 @@ from typing import Dict, Any, Optional, Union, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Word boundaries used to split camelCase keys
+_CAMEL_WORD_PATTERN = re.compile('(.)([A-Z][a-z]+)')
+_CAMEL_CASE_PATTERN = re.compile('([a-z0-9])([A-Z])')
+
+# XML declaration and DataServices PI written ahead of the root element
+EDM_PROLOG = ('<?xml version="1.0" standalone="no"?>\n'
+              '<?DataServices DB_Major_Version=14;DB_Minor_Version=00;DB_Build_Version=000;'
+              'DB_Version=EDM 5000.14.0 (14.00.00.000);expandPoint=CD_SCENARIO;?>\n')
+
 # Define standard attribute order
 ATTRIBUTE_ORDER = [
     # Primary entities
@@ -63,7 +72,8 @@ def load_xml_template(template_path: str) -> ET.ElementTree:
         Exception: If template loading fails
     """
     try:
-        return ET.parse(template_path)
+        parser = ET.XMLParser(huge_tree=True, collect_ids=False)
+        return ET.parse(template_path, parser)
     except Exception as e:
         logger.error(f"Failed to load XML template: {str(e)}")
         raise Exception(f"Failed to load XML template: {str(e)}")
@@ -78,8 +88,8 @@ def convert_camel_to_xml_key(camel_case_key: str) -> str:
     Returns:
         str: UPPER_SNAKE_CASE key
     """
-    s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', camel_case_key)
-    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).upper()
+    s1 = _CAMEL_WORD_PATTERN.sub(r'\1_\2', camel_case_key)
+    return _CAMEL_CASE_PATTERN.sub(r'\1_\2', s1).upper()
 
 def find_element_by_attributes(root: ET.Element, tag_name: str, 
                               attributes: Dict[str, str]) -> Optional[ET.Element]:
@@ -94,14 +104,10 @@ def find_element_by_attributes(root: ET.Element, tag_name: str,
     Returns:
         Element: Found element or None
     """
-    elements = root.findall(f".//{tag_name}")
-    for element in elements:
-        matches = True
-        for attr, value in attributes.items():
-            if element.get(attr) != str(value):
-                matches = False
-                break
-        if matches:
+    # Stringify the expected values once and stop at the first match
+    expected = [(attr, str(value)) for attr, value in attributes.items()]
+    for element in root.iterdescendants(tag_name):
+        if all(element.get(attr) == value for attr, value in expected):
             return element
     return None
 
@@ -129,52 +135,8 @@ def get_xml_string(self) -> str:
     Returns:
         str: Formatted XML string
     """
-    from utils.xml_helpers import format_xml_with_line_breaks
-    
-    # Get the XML string
-    xml_string = ET.tostring(self.root, encoding='utf-8', xml_declaration=True).decode('utf-8')
-    
-    # Replace the XML declaration with the standard format including DataServices PI
-    xml_string = xml_string.replace('<?xml version=\'1.0\' encoding=\'utf-8\'?>', 
-                  '<?xml version="1.0" standalone="no"?>\n<?DataServices DB_Major_Version=14;DB_Minor_Version=00;DB_Build_Version=000;DB_Version=EDM 5000.14.0 (14.00.00.000);expandPoint=CD_SCENARIO;?>')
-    
-    # Apply explicit formatting with line breaks
-    xml_string = format_xml_with_line_breaks(xml_string)
-    
-    return xml_string
-
-def format_xml_with_line_breaks(xml_string: str) -> str:
-    """
-    Force line breaks after each XML tag, regardless of pretty_print setting.
-    
-    Args:
-        xml_string: Input XML string
-        
-    Returns:
-        str: XML string with line breaks after each tag
-    """
-    # Add line break after each closing tag
-    xml_string = xml_string.replace('><', '>\n<')
-    
-    # Add line breaks after self-closing tags
-    xml_string = xml_string.replace('/>', '/>\n')
-    
-    # Ensure proper line break after xml declaration
-    xml_string = xml_string.replace('?>', '?>\n')
-    
-    return xml_string
-
-def format_timestamp(date_str: str) -> Optional[str]:
-    """
-    Format a date string as a timestamp for the XML.
-    
-    Args:
-        date_str: Date string in format 'YYYY-MM-DD HH:MM:SS'
-        
-    Returns:
-        str: Formatted timestamp string like "{ts '2025-04-02 16:36:52'}"
-    """
-    if not date_str:
-        return None
+    # Put every element on its own line
+    ET.indent(self.root, space='')
     
-    return f"{{ts '{date_str}'}}"
\ No newline at end of file
+    # Prefix the standard declaration including the DataServices PI
+    return EDM_PROLOG + ET.tostring(self.root, encoding='unicode')